@@ -10,18 +10,77 @@ from groq import Groq
 from back_end.tts_generator import generate_tts_audio
 from back_end.image_generator import (
     generate_image_from_prompt,
+    generate_images_batched,
     split_story_to_chunks,
-    generate_image_prompt
+    generate_image_prompt,
+    BATCH_IMAGES
 )
 
 import concurrent.futures
+import re
 
 from back_end.ebook_generator import build_epub_from_story
+from back_end.prefetch import TranslationPrefetcher
+from back_end.utils import call_with_budget, TRANSLATION_FAILED
+from back_end.storage import (
+    get_store,
+    content_key,
+    cached_call,
+    image_to_bytes,
+    bytes_to_image,
+    save_story_manifest,
+    load_story_manifest
+)
+from back_end.profiling import (
+    RunProfiler,
+    profiled_call,
+    profiling_requested,
+    list_runs,
+    load_pstats
+)
 
+import hmac
 import time
 
 st.set_page_config(page_title="FeedoDo - Histoire magique", layout="wide")
 
+# --- Page d’administration cachée : profils des derniers runs (?admin=profils&token=...) ---
+if st.query_params.get("admin") == "profils":
+    admin_token = os.getenv("FEEDODO_ADMIN_TOKEN")
+    if not admin_token or not hmac.compare_digest(st.query_params.get("token", ""), admin_token):
+        st.error("⛔ Accès refusé.")
+        st.stop()
+
+    st.title("🩺 Profils des derniers runs")
+    st.caption(
+        "Portée cProfile « run » : thread du script et tâches d’images/audio de cette génération. "
+        "Portée « processus » (Python ≥ 3.12) : tous les threads du serveur pendant le run, "
+        "y compris les autres sessions et les traductions spéculatives. "
+        "Les allocations tracemalloc couvrent toujours tout le processus."
+    )
+    runs = list_runs()
+    if not runs:
+        st.info("Aucun profil enregistré (activez FEEDODO_PROFILE=1 ou ajoutez ?profile=1 à l’URL).")
+    for run in runs:
+        with st.expander(
+            f"{run['run_id']} — {run['wall_time_s']} s, pic mémoire {run['memory_peak_kib']} Kio, "
+            f"portée cProfile : {run.get('cprofile_scope', 'run')}"
+        ):
+            st.subheader("Fonctions les plus coûteuses (temps cumulé)")
+            st.dataframe(run["top_functions"], use_container_width=True)
+            st.subheader("Plus grosses allocations (tracemalloc)")
+            st.dataframe(run["top_allocations"], use_container_width=True)
+            pstats_data = load_pstats(run["run_id"])
+            if pstats_data:
+                st.download_button(
+                    label="⬇️ Télécharger le .pstats",
+                    data=pstats_data,
+                    file_name=f"{run['run_id']}.pstats",
+                    mime="application/octet-stream",
+                    key=f"pstats_{run['run_id']}"
+                )
+    st.stop()
+
 # --- Intro magique avec bouton ---
 # --- Intro avec GIF magique et bouton ---
 # --- Splash screen Fée Dodo (5 secondes, automatique) ---
@@ -311,6 +370,13 @@ st.markdown(f"""
 load_dotenv()
 client = Groq(api_key=os.getenv("GROQ_API_KEY"))
 
+# Stockage partagé des artefacts (disque local ou Redis) : une instance par processus
+@st.cache_resource
+def load_artifact_store():
+    return get_store()
+
+store = load_artifact_store()
+
 LANGUAGES = {
     "🇫🇷 Français": "fr",
     "🇬🇧 English": "en",
@@ -339,7 +405,7 @@ def translate_text(text: str, source_lang: str, target_lang: str) -> str:
     response = requests.get(url, params=params)
     if response.status_code == 200:
         return ''.join([part[0] for part in response.json()[0]])
-    return "[Échec de la traduction]"
+    return TRANSLATION_FAILED
 
 # ────────────────────────────────────────────────────────────────────
 # 5. FONCTION DE GÉNÉRATION D’HISTOIRE VIA MISTRAL
@@ -359,11 +425,105 @@ def generate_story(keywords: list[str], lang_code: str) -> str:
     )
     return response.choices[0].message.content
 
+# ────────────────────────────────────────────────────────────────────
+# 5 bis. CACHE PARTAGÉ : TRADUCTIONS, AUDIOS, IMAGES ET HISTOIRES
+# ────────────────────────────────────────────────────────────────────
+def cached_translate_text(text: str, source_lang: str, target_lang: str) -> str:
+    key = content_key("translation", text, source_lang, target_lang)
+    data = store.get(key)
+    if data is not None:
+        return data.decode("utf-8")
+    translated = translate_text(text, source_lang, target_lang)
+    # On ne garde pas les échecs en cache
+    if translated != TRANSLATION_FAILED:
+        store.put(key, translated.encode("utf-8"))
+    return translated
+
+def cached_tts_audio(text: str, lang: str) -> BytesIO:
+    return cached_call(
+        store,
+        content_key("audio", text, lang),
+        lambda: generate_tts_audio(text, lang),
+        lambda audio: audio.getvalue(),
+        BytesIO
+    )
+
+def cached_image_from_prompt(prompt: str):
+    return cached_call(
+        store,
+        content_key("image", prompt),
+        lambda: generate_image_from_prompt(prompt),
+        image_to_bytes,
+        bytes_to_image
+    )
+
+def cached_images_batched(parts: list[str]) -> tuple[list, list[RuntimeError]]:
+    """
+    Mode groupé : reprend du stockage les scènes déjà illustrées (lecture groupée)
+    et génère les autres en images en grille. Renvoie (images ou None, erreurs).
+    """
+    keys = [content_key("image", generate_image_prompt(part)) for part in parts]
+    images_by_key = {key: bytes_to_image(data) for key, data in store.get_many(keys).items()}
+    missing = [(part, key) for part, key in zip(parts, keys) if key not in images_by_key]
+    errors = []
+    if missing:
+        generated, errors = generate_images_batched([part for part, _ in missing])
+        new_images = {key: image for (_, key), image in zip(missing, generated) if image is not None}
+        store.put_many({key: image_to_bytes(image) for key, image in new_images.items()})
+        images_by_key.update(new_images)
+    return [images_by_key.get(key) for key in keys], errors
+
+def save_session_story() -> str:
+    """
+    Enregistre l’histoire de la session (textes + clés des artefacts) et place sa clé
+    dans l’URL, pour que n’importe quel réplica puisse reprendre la session.
+    """
+    translated_lang = st.session_state.get("translated_lang")
+    story_translated = st.session_state.get("story_translated")
+    key = save_story_manifest(store, {
+        "story": st.session_state.story,
+        "story_lang": st.session_state.story_lang,
+        "images": [
+            [part, content_key("image", generate_image_prompt(part))]
+            for part, _ in st.session_state.images
+        ],
+        "audio_original": content_key("audio", st.session_state.story, st.session_state.story_lang),
+        "story_translated": story_translated,
+        "translated_lang": translated_lang,
+        "audio_translated": (
+            content_key("audio", story_translated, translated_lang) if story_translated else None
+        )
+    })
+    st.session_state.story_key = key
+    st.query_params["histoire"] = key.partition(":")[2]
+    return key
+
+def load_session_story(digest: str) -> bool:
+    """
+    Recharge dans la session une histoire enregistrée par save_session_story().
+    """
+    # La clé vient de l’URL : uniquement un sha256 hexadécimal
+    if not re.fullmatch(r"[0-9a-f]{64}", digest):
+        return False
+    key = f"story:{digest}"
+    state = load_story_manifest(store, key)
+    if state is None:
+        return False
+    for name, value in state.items():
+        st.session_state[name] = value
+    st.session_state.story_key = key
+    return True
+
 # ────────────────────────────────────────────────────────────────────
 # 6. AFFICHAGE DE L’INTERFACE STREAMLIT
 # ────────────────────────────────────────────────────────────────────
 st.title("📖 Bienvenue dans FeedoDo : l’usine à histoires magiques !")
 
+# Reprise d’une histoire générée par un autre réplica (ou avant un rechargement)
+if "story" not in st.session_state and "histoire" in st.query_params:
+    if not load_session_story(st.query_params["histoire"]):
+        st.warning("⏳ Cette histoire a expiré, veuillez en générer une nouvelle.")
+
 # Choix de la langue et option de traduction
 show_translation = st.checkbox("🧚‍♀️ Traduire dans une autre langue ?")
 
@@ -384,193 +544,292 @@ else:
     lang_output_label = None
     lang_output_code = None
 
+# Traduction spéculative : prépare les autres langues pendant la lecture
+prefetch_enabled = st.checkbox("⚡ Préparer les autres langues en arrière-plan")
+
 # Saisie des mots-clés
 keywords_input = st.text_input(f"📝 Mots-clés ({lang_input_label}) :")
 
-# Bouton pour générer l’histoire et barre de chargement asynchrone
-if st.button("🚀 Générer l’histoire magique"):
-    # ───────────────────────────────────────────────────────────────
-    # ==> On supprime d’abord tout ce qui pourrait rester d’une ancienne histoire
-    # ───────────────────────────────────────────────────────────────
-    for key in ["story", "story_translated", "audio_original", "audio_translated", "images"]:
-        if key in st.session_state:
-            del st.session_state[key]
-
-    keywords = [k.strip() for k in keywords_input.split(",") if k.strip()]
-    if not keywords:
-        st.error("⚠️ Veuillez entrer au moins un mot-clé.")
-    else:
-        # Barre de progression
-        progress = st.progress(0)
-        step = 0
-
-        # 1) Génération de l’histoire
-        with st.spinner("🧠 Génération de l’histoire..."):
-            story = generate_story(keywords, lang_input_code)
-        step += 1
-
-        # 2) Traduction complète si demandée
-        if show_translation:
-            with st.spinner("🌍 Traduction de l’histoire..."):
-                story_translated = translate_text(story, lang_input_code, lang_output_code)
-            step += 1
+# Profilage d’un run (génération ou EPUB), arrêté à la fin du script
+profiler = None
+
+def start_profiling(label: str):
+    global profiler
+    if profiling_requested(st.query_params):
+        profiler = RunProfiler(label)
+        if not profiler.start():
+            profiler = None
+
+# Tout ce qui suit peut être profilé : la section 9 (finally) clôt le profil
+# même si la génération lève une exception
+try:
+    # Bouton pour générer l’histoire et barre de chargement asynchrone
+    if st.button("🚀 Générer l’histoire magique"):
+        start_profiling("generation")
+
+        # ───────────────────────────────────────────────────────────────
+        # ==> On supprime d’abord tout ce qui pourrait rester d’une ancienne histoire
+        # ───────────────────────────────────────────────────────────────
+        if "prefetcher" in st.session_state:
+            st.session_state.prefetcher.cancel()
+        for key in ["story", "story_translated", "audio_original", "audio_translated", "images",
+                    "translated_lang", "prefetcher", "story_lang", "story_key"]:
+            if key in st.session_state:
+                del st.session_state[key]
+
+        keywords = [k.strip() for k in keywords_input.split(",") if k.strip()]
+        if not keywords:
+            st.error("⚠️ Veuillez entrer au moins un mot-clé.")
         else:
-            story_translated = None
-
-        # Découper l’histoire en scènes
-        parts = split_story_to_chunks(story, n=2)
-
-        # Calcul du nombre total d’étapes pour la barre de progression
-        total_steps = 1  # génération d’histoire
-        if show_translation:
-            total_steps += 1  # traduction
-        total_steps += len(parts)  # nombre de scènes/images
-        total_steps += 1  # audio original
-        if show_translation:
-            total_steps += 1  # audio traduit
-
-        progress.progress(int(step * 100 / total_steps))
-
-        # 3) Génération des images ET des audios en parallèle
-        images = []
-        clipdrop_error = False
-
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            # Soumettre toutes les tâches de génération d’images
-            image_futures = {
-                executor.submit(generate_image_from_prompt, generate_image_prompt(part)): part
-                for part in parts
-            }
+            # Barre de progression
+            progress = st.progress(0)
+            step = 0
 
-            # Soumettre génération audio original
-            audio_original_future = executor.submit(generate_tts_audio, story, lang_input_code)
-
-            # Soumettre audio traduit si nécessaire
-            if show_translation and story_translated:
-                audio_translated_future = executor.submit(generate_tts_audio, story_translated, lang_output_code)
-            else:
-                audio_translated_future = None
-
-            # Traiter résultats d’images dès qu’elles tombent
-            for future in concurrent.futures.as_completed(image_futures):
-                part = image_futures[future]
-                try:
-                    image = future.result()
-                    images.append((part, image))
-                except RuntimeError as e:
-                    if "402" in str(e):
-                        st.error("❌ Crédits ClipDrop épuisés, impossible de générer d’autres images.")
-                    else:
-                        st.warning(f"⚠️ {e}")
-                    clipdrop_error = True
-                    break
-                step += 1
-                progress.progress(int(step * 100 / total_steps))
-
-            st.session_state.images = images
-
-            # 4) Récupérer l’audio original
-            if audio_original_future:
-                audio_original = audio_original_future.result()
-                st.session_state.audio_original = audio_original
-                step += 1
-                progress.progress(int(step * 100 / total_steps))
+            # 1) Génération de l’histoire
+            with st.spinner("🧠 Génération de l’histoire..."):
+                story = call_with_budget(generate_story, keywords, lang_input_code)
+            step += 1
 
-            # 5) Récupérer l’audio traduit
-            if audio_translated_future:
-                audio_translated = audio_translated_future.result()
-                st.session_state.audio_translated = audio_translated
+            # 2) Traduction complète si demandée
+            if show_translation:
+                with st.spinner("🌍 Traduction de l’histoire..."):
+                    story_translated = call_with_budget(cached_translate_text, story, lang_input_code, lang_output_code)
                 step += 1
-                progress.progress(int(step * 100 / total_steps))
-
-        # Stocker l’histoire et la version traduite dans la session
-        st.session_state.story = story
+            else:
+                story_translated = None
+
+            # Découper l’histoire en scènes
+            parts = split_story_to_chunks(story, n=2)
+
+            # Calcul du nombre total d’étapes pour la barre de progression
+            total_steps = 1  # génération d’histoire
+            if show_translation:
+                total_steps += 1  # traduction
+            total_steps += len(parts)  # nombre de scènes/images
+            total_steps += 1  # audio original
+            if show_translation:
+                total_steps += 1  # audio traduit
+
+            progress.progress(int(step * 100 / total_steps))
+
+            # 3) Génération des images ET des audios en parallèle
+            images = []
+            clipdrop_error = False
+
+            with concurrent.futures.ThreadPoolExecutor() as executor:
+                # Soumettre toutes les tâches de génération d’images
+                if BATCH_IMAGES:
+                    # Mode groupé : images en grille ; chaque appel ClipDrop prend sa place du budget
+                    image_futures = {executor.submit(profiled_call, profiler, cached_images_batched, parts): parts}
+                else:
+                    image_futures = {
+                        executor.submit(
+                            profiled_call, profiler, call_with_budget, cached_image_from_prompt,
+                            generate_image_prompt(part)
+                        ): [part]
+                        for part in parts
+                    }
+
+                # Soumettre génération audio original
+                audio_original_future = executor.submit(
+                    profiled_call, profiler, call_with_budget, cached_tts_audio, story, lang_input_code
+                )
+
+                # Soumettre audio traduit si nécessaire
+                if show_translation and story_translated:
+                    audio_translated_future = executor.submit(
+                        profiled_call, profiler, call_with_budget, cached_tts_audio, story_translated,
+                        lang_output_code
+                    )
+                else:
+                    audio_translated_future = None
+
+                # Traiter résultats d’images dès qu’elles tombent
+                for future in concurrent.futures.as_completed(image_futures):
+                    scene_parts = image_futures[future]
+                    try:
+                        if BATCH_IMAGES:
+                            scene_images, scene_errors = future.result()
+                        else:
+                            scene_images, scene_errors = [future.result()], []
+                    except RuntimeError as e:
+                        scene_images, scene_errors = [], [e]
+                    # On garde les scènes réussies même si d’autres ont échoué
+                    images.extend(
+                        (part, image) for part, image in zip(scene_parts, scene_images) if image is not None
+                    )
+                    if scene_errors:
+                        if any("402" in str(e) for e in scene_errors):
+                            st.error("❌ Crédits ClipDrop épuisés, impossible de générer d’autres images.")
+                        else:
+                            st.warning(f"⚠️ {scene_errors[0]}")
+                        clipdrop_error = True
+                        break
+                    step += len(scene_parts)
+                    progress.progress(int(step * 100 / total_steps))
+
+                st.session_state.images = images
+
+                # 4) Récupérer l’audio original
+                if audio_original_future:
+                    audio_original = audio_original_future.result()
+                    st.session_state.audio_original = audio_original
+                    step += 1
+                    progress.progress(int(step * 100 / total_steps))
+
+                # 5) Récupérer l’audio traduit
+                if audio_translated_future:
+                    audio_translated = audio_translated_future.result()
+                    st.session_state.audio_translated = audio_translated
+                    step += 1
+                    progress.progress(int(step * 100 / total_steps))
+
+            # Stocker l’histoire et la version traduite dans la session
+            st.session_state.story = story
+            st.session_state.story_lang = lang_input_code
+            st.session_state.story_translated = story_translated
+            st.session_state.translated_lang = lang_output_code if story_translated else None
+            save_session_story()
+
+            # 6) Lancer la préparation des autres langues (basse priorité, annulable)
+            if prefetch_enabled:
+                prefetcher = TranslationPrefetcher(cached_translate_text, cached_tts_audio)
+                prefetcher.start(
+                    story,
+                    lang_input_code,
+                    [code for code in LANGUAGES.values() if code != st.session_state.translated_lang]
+                )
+                st.session_state.prefetcher = prefetcher
+
+            # Finaliser à 100 %
+            progress.progress(100)
+            st.success("✅ Tout a été généré avec succès !")
+
+    # ────────────────────────────────────────────────────────────────────
+    # 7. AFFICHAGE DU RÉSULTAT UNE FOIS GÉNÉRÉ
+    # ────────────────────────────────────────────────────────────────────
+    # Changement de langue cible après génération : reprendre la traduction préparée
+    # en arrière-plan si elle est prête, sinon la produire tout de suite
+    # (les illustrations existantes sont conservées dans les deux cas)
+    if (
+        show_translation
+        and st.session_state.get("story")
+        and st.session_state.get("translated_lang") != lang_output_code
+    ):
+        prefetcher = st.session_state.get("prefetcher")
+        prefetched = prefetcher.get(lang_output_code, timeout=0) if prefetcher else None
+        if prefetched:
+            story_translated, audio_translated = prefetched
+        else:
+            # Pas prête ou en échec : on n’attend pas la file spéculative
+            if prefetcher:
+                prefetcher.cancel(lang_output_code)
+            story_lang = st.session_state.story_lang
+            with st.spinner("🌍 Traduction de l’histoire..."):
+                story_translated = call_with_budget(
+                    cached_translate_text, st.session_state.story, story_lang, lang_output_code
+                )
+                audio_translated = call_with_budget(cached_tts_audio, story_translated, lang_output_code)
         st.session_state.story_translated = story_translated
+        st.session_state.audio_translated = audio_translated
+        st.session_state.translated_lang = lang_output_code
+        save_session_story()
+
+    if "story" in st.session_state and st.session_state.story:
+        # 1) Afficher les scènes illustrées
+        st.header("🎨 Illustrations magiques de l’histoire")
+        if st.session_state.images:
+            for idx, (part, image) in enumerate(st.session_state.images):
+                buffered = BytesIO()
+                image.save(buffered, format="PNG")
+                img_str = base64.b64encode(buffered.getvalue()).decode()
+                st.markdown(f"""
+                    <div class="parchment-container">
+                        <div class="parchment">
+                            <h3>Scène {idx+1}</h3>
+                            <img src="data:image/png;base64,{img_str}" />
+                            <p>{part}</p>
+                        </div>
+                    </div>
+                """, unsafe_allow_html=True)
+        else:
+            st.info("Aucune illustration disponible (crédits ClipDrop épuisés ou erreur).")
 
-        # Finaliser à 100 %
-        progress.progress(100)
-        st.success("✅ Tout a été généré avec succès !")
+        # 2) Afficher audio complet d’origine
+        st.header("🔊 Audio complet (Langue originale)")
+        if st.session_state.audio_original:
+            st.audio(st.session_state.audio_original, format="audio/mp3")
+            st.download_button(
+                label=download_labels.get(lang_input_code, "⬇️ Télécharger l'audio"),
+                data=st.session_state.audio_original,
+                file_name=f"histoire_complet_{lang_input_code}.mp3",
+                mime="audio/mp3",
+                use_container_width=True
+            )
 
-# ────────────────────────────────────────────────────────────────────
-# 7. AFFICHAGE DU RÉSULTAT UNE FOIS GÉNÉRÉ
-# ────────────────────────────────────────────────────────────────────
-if "story" in st.session_state and st.session_state.story:
-    # 1) Afficher les scènes illustrées
-    st.header("🎨 Illustrations magiques de l’histoire")
-    if st.session_state.images:
-        for idx, (part, image) in enumerate(st.session_state.images):
-            buffered = BytesIO()
-            image.save(buffered, format="PNG")
-            img_str = base64.b64encode(buffered.getvalue()).decode()
+        # 3) Afficher audio complet traduit + texte traduit (si demandé)
+        if (
+            show_translation
+            and st.session_state.get("story_translated")
+            and st.session_state.get("translated_lang") == lang_output_code
+        ):
+            st.header("🔊 Audio complet (Version traduite)")
+            if st.session_state.audio_translated:
+                st.audio(st.session_state.audio_translated, format="audio/mp3")
+                st.download_button(
+                    label=download_labels.get(lang_output_code, "⬇️ Télécharger l'audio traduit"),
+                    data=st.session_state.audio_translated,
+                    file_name=f"histoire_complet_{lang_output_code}.mp3",
+                    mime="audio/mp3",
+                    use_container_width=True
+                )
             st.markdown(f"""
                 <div class="parchment-container">
                     <div class="parchment">
-                        <h3>Scène {idx+1}</h3>
-                        <img src="data:image/png;base64,{img_str}" />
-                        <p>{part}</p>
+                        <h3>Histoire complète traduite ({lang_output_label})</h3>
+                        <p>{st.session_state.story_translated.replace('\n', '<br>')}</p>
                     </div>
                 </div>
             """, unsafe_allow_html=True)
-    else:
-        st.info("Aucune illustration disponible (crédits ClipDrop épuisés ou erreur).")
-
-    # 2) Afficher audio complet d’origine
-    st.header("🔊 Audio complet (Langue originale)")
-    if st.session_state.audio_original:
-        st.audio(st.session_state.audio_original, format="audio/mp3")
-        st.download_button(
-            label=download_labels.get(lang_input_code, "⬇️ Télécharger l'audio"),
-            data=st.session_state.audio_original,
-            file_name=f"histoire_complet_{lang_input_code}.mp3",
-            mime="audio/mp3",
-            use_container_width=True
-        )
 
-    # 3) Afficher audio complet traduit + texte traduit (si demandé)
-    if show_translation and "story_translated" in st.session_state and st.session_state.story_translated:
-        st.header("🔊 Audio complet (Version traduite)")
-        if st.session_state.audio_translated:
-            st.audio(st.session_state.audio_translated, format="audio/mp3")
+    # ────────────────────────────────────────────────────────────────────
+    # 8. BOUTON “TÉLÉCHARGER L’HISTOIRE” EN EPUB UNIQUEMENT
+    # ────────────────────────────────────────────────────────────────────
+    if "story" in st.session_state and st.session_state.story:
+        st.header("📚 Télécharger l’histoire complète (EPUB uniquement)")
+
+        if st.button("⬇️ Télécharger en EPUB"):
+            start_profiling("epub")
+
+            # Préparer les métadonnées de l’ePub
+            metadata = {
+                "title": "Histoire Magique Générée",
+                "language": lang_input_code,
+                "author": "FeedoDo",
+                "description": f"Histoire générée via FeedoDo le {__import__('datetime').datetime.now().date()}"
+            }
+
+            # Générer l’EPUB en mémoire (ou le reprendre du stockage partagé)
+            images = st.session_state.images
+            epub_data = cached_call(
+                store,
+                content_key("epub", st.session_state.story_key, lang_input_code, metadata["description"]),
+                lambda: build_epub_from_story(st.session_state.story, images, metadata).getvalue(),
+                bytes,
+                bytes
+            )
+
+            # Proposer le téléchargement direct du .epub
             st.download_button(
-                label=download_labels.get(lang_output_code, "⬇️ Télécharger l'audio traduit"),
-                data=st.session_state.audio_translated,
-                file_name=f"histoire_complet_{lang_output_code}.mp3",
-                mime="audio/mp3",
+                label="Télécharger l’ePub",
+                data=epub_data,
+                file_name="histoire_magique.epub",
+                mime="application/epub+zip",
                 use_container_width=True
             )
-        st.markdown(f"""
-            <div class="parchment-container">
-                <div class="parchment">
-                    <h3>Histoire complète traduite ({lang_output_label})</h3>
-                    <p>{st.session_state.story_translated.replace('\n', '<br>')}</p>
-                </div>
-            </div>
-        """, unsafe_allow_html=True)
-
-# ────────────────────────────────────────────────────────────────────
-# 8. BOUTON “TÉLÉCHARGER L’HISTOIRE” EN EPUB UNIQUEMENT
-# ────────────────────────────────────────────────────────────────────
-if "story" in st.session_state and st.session_state.story:
-    st.header("📚 Télécharger l’histoire complète (EPUB uniquement)")
-
-    if st.button("⬇️ Télécharger en EPUB"):
-        # Préparer les métadonnées de l’ePub
-        metadata = {
-            "title": "Histoire Magique Générée",
-            "language": lang_input_code,
-            "author": "FeedoDo",
-            "description": f"Histoire générée via FeedoDo le {__import__('datetime').datetime.now().date()}"
-        }
-
-        # Générer l’EPUB en mémoire
-        images = st.session_state.images
-        epub_buffer = build_epub_from_story(st.session_state.story, images, metadata)
-
-        # Proposer le téléchargement direct du .epub
-        st.download_button(
-            label="Télécharger l’ePub",
-            data=epub_buffer.getvalue(),
-            file_name="histoire_magique.epub",
-            mime="application/epub+zip",
-            use_container_width=True
-        )
+finally:
+    # ────────────────────────────────────────────────────────────────────
+    # 9. FIN DU PROFILAGE (inclut le rendu base64 des illustrations)
+    # ────────────────────────────────────────────────────────────────────
+    if profiler is not None:
+        profiler.stop()
@@ -2,15 +2,31 @@
 
 import requests
 import os
+import math
+import concurrent.futures
 from io import BytesIO
-from PIL import Image
+from PIL import Image, ImageStat
 from dotenv import load_dotenv
+from back_end.utils import call_with_budget
 
 # Charger les variables d’environnement
 load_dotenv()
 
 CLIPDROP_API_KEY = os.getenv("CLIPDROP_API_KEY")
 
+# Mode groupé : une seule illustration en grille pour toutes les scènes
+BATCH_IMAGES = os.getenv("FEEDODO_BATCH_IMAGES") == "1"
+
+# Limite de longueur du prompt acceptée par ClipDrop
+CLIPDROP_PROMPT_MAX = 1000
+# Taille (carrée) des images renvoyées par ClipDrop
+CLIPDROP_IMAGE_SIZE = 1024
+
+# Contrôle qualité des vignettes découpées dans la grille
+TILE_MIN_SIZE = 256
+TILE_MIN_STDDEV = 12.0
+TILE_INSET = 0.02
+
 def generate_image_from_prompt(prompt: str) -> Image.Image:
     """
     Génère une image à partir d’un prompt via l’API ClipDrop.
@@ -49,3 +65,130 @@ def generate_image_prompt(text: str) -> str:
     )
 
     return base_prompt + extrait
+
+def grid_shape(n: int) -> tuple[int, int]:
+    """
+    Renvoie (lignes, colonnes) de la grille la plus carrée pouvant contenir `n` scènes.
+    """
+    cols = math.ceil(math.sqrt(n))
+    rows = math.ceil(n / cols)
+    return rows, cols
+
+def generate_grid_prompt(parts: list[str]) -> tuple[str, int, int]:
+    """
+    Construit un prompt décrivant toutes les scènes dans une seule image en grille.
+    Renvoie (prompt, lignes, colonnes).
+    """
+    rows, cols = grid_shape(len(parts))
+    header = (
+        f"A children's storybook page split into a {rows}x{cols} grid of {len(parts)} separate, "
+        "equally sized panels with thin white borders, soft pastel colors, cute dreamy style, "
+        "same characters in every panel. No text, letters, captions, speech bubbles or watermarks. "
+    )
+    # Répartir la place restante entre les scènes
+    per_scene = (CLIPDROP_PROMPT_MAX - len(header)) // len(parts) - len("Panel 00: . ")
+    panels = " ".join(
+        f"Panel {idx}: {part.strip()[:per_scene]}."
+        for idx, part in enumerate(parts, start=1)
+    )
+    return header + panels, rows, cols
+
+def tile_size(rows: int, cols: int, image_size: int = CLIPDROP_IMAGE_SIZE) -> tuple[int, int]:
+    """
+    Renvoie (largeur, hauteur) d’une vignette rognée pour une grille `rows` x `cols`.
+    """
+    tile_w, tile_h = image_size // cols, image_size // rows
+    return tile_w - 2 * int(tile_w * TILE_INSET), tile_h - 2 * int(tile_h * TILE_INSET)
+
+def max_scenes_per_grid() -> int:
+    """
+    Plus grand nombre de scènes par grille dont les vignettes restent au-dessus de TILE_MIN_SIZE.
+    """
+    n = 1
+    while min(tile_size(*grid_shape(n + 1))) >= TILE_MIN_SIZE:
+        n += 1
+    return n
+
+def split_into_grids(parts: list[str]) -> list[list[str]]:
+    """
+    Répartit les scènes en groupes de tailles proches, chacun tenant dans une grille valide.
+    Un groupe d’une seule scène sera illustré par un appel classique.
+    """
+    n_grids = math.ceil(len(parts) / max_scenes_per_grid())
+    size = math.ceil(len(parts) / n_grids)
+    return [parts[i:i + size] for i in range(0, len(parts), size)]
+
+def slice_grid(image: Image.Image, rows: int, cols: int, n: int) -> list[Image.Image]:
+    """
+    Découpe l’image en grille et renvoie les `n` premières vignettes (ligne par ligne),
+    en rognant légèrement les bords pour retirer les séparations entre panneaux.
+    """
+    width, height = image.size
+    tile_w, tile_h = width // cols, height // rows
+    inset_w, inset_h = int(tile_w * TILE_INSET), int(tile_h * TILE_INSET)
+    tiles = []
+    for idx in range(n):
+        row, col = divmod(idx, cols)
+        left, top = col * tile_w, row * tile_h
+        tiles.append(image.crop((
+            left + inset_w,
+            top + inset_h,
+            left + tile_w - inset_w,
+            top + tile_h - inset_h
+        )))
+    return tiles
+
+def tile_is_valid(tile: Image.Image) -> bool:
+    """
+    Rejette les vignettes trop petites ou quasi uniformes (panneau vide, bordure, fond).
+    """
+    if min(tile.size) < TILE_MIN_SIZE:
+        return False
+    return ImageStat.Stat(tile.convert("L")).stddev[0] >= TILE_MIN_STDDEV
+
+def generate_images_batched(
+    parts: list[str], image_fn=generate_image_from_prompt
+) -> tuple[list[Image.Image | None], list[RuntimeError]]:
+    """
+    Illustre les scènes avec une image en grille par groupe de scènes, découpée en vignettes,
+    puis régénère en parallèle, scène par scène, les vignettes invalides ou manquantes.
+    Chaque appel ClipDrop occupe sa propre place du budget partagé.
+    Renvoie (images dans l’ordre des scènes, None pour les scènes en échec ; erreurs du repli).
+    Des crédits épuisés (402) sur un appel groupé interrompent tout.
+    """
+    images = [None] * len(parts)
+    errors = []
+    with concurrent.futures.ThreadPoolExecutor() as executor:
+        # 1) Une image en grille par groupe de plusieurs scènes
+        grid_futures = {}
+        offset = 0
+        for group in split_into_grids(parts):
+            if len(group) > 1:
+                prompt, rows, cols = generate_grid_prompt(group)
+                grid_futures[executor.submit(call_with_budget, image_fn, prompt)] = (offset, len(group), rows, cols)
+            offset += len(group)
+
+        for future, (offset, count, rows, cols) in grid_futures.items():
+            try:
+                grid = future.result()
+            except RuntimeError as e:
+                if "402" in str(e):
+                    raise
+                continue
+            for idx, tile in enumerate(slice_grid(grid, rows, cols, count)):
+                if tile_is_valid(tile):
+                    images[offset + idx] = tile
+
+        # 2) Repli en parallèle pour les scènes sans vignette valide
+        fallback_futures = {
+            executor.submit(call_with_budget, image_fn, generate_image_prompt(part)): idx
+            for idx, part in enumerate(parts)
+            if images[idx] is None
+        }
+        for future in concurrent.futures.as_completed(fallback_futures):
+            try:
+                images[fallback_futures[future]] = future.result()
+            except RuntimeError as e:
+                errors.append(e)
+
+    return images, errors
@@ -0,0 +1,87 @@
+# back_end/prefetch.py
+
+import os
+import threading
+import concurrent.futures
+from back_end.utils import call_with_budget, TRANSLATION_FAILED
+
+# Les tâches spéculatives n’occupent jamais plus de SPECULATIVE_SLOTS places
+# du budget partagé, toutes sessions confondues : la génération demandée
+# explicitement par l’utilisateur reste prioritaire.
+SPECULATIVE_SLOTS = threading.BoundedSemaphore(int(os.getenv("FEEDODO_SPECULATIVE_SLOTS", "1")))
+
+
+class TranslationPrefetcher:
+    """
+    Traduit une histoire et synthétise l’audio traduit en arrière-plan,
+    langue par langue, pour que le changement de langue cible soit immédiat.
+    - translate_fn(text, source_lang, target_lang) -> str
+    - tts_fn(text, lang) -> BytesIO
+    """
+
+    def __init__(self, translate_fn, tts_fn):
+        self._translate_fn = translate_fn
+        self._tts_fn = tts_fn
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="feedodo-prefetch"
+        )
+        self._cancelled = threading.Event()
+        self._cancelled_langs = set()
+        self._futures = {}
+
+    def start(self, story: str, source_lang: str, target_langs: list[str]) -> None:
+        """
+        Planifie la traduction + l’audio pour chaque langue de `target_langs`.
+        """
+        for lang in target_langs:
+            if lang == source_lang or lang in self._futures:
+                continue
+            self._cancelled_langs.discard(lang)
+            self._futures[lang] = self._executor.submit(self._run, story, source_lang, lang)
+
+    def _speculative_call(self, lang: str, fn, *args):
+        with SPECULATIVE_SLOTS:
+            if self._cancelled.is_set() or lang in self._cancelled_langs:
+                return None
+            return call_with_budget(fn, *args)
+
+    def _run(self, story: str, source_lang: str, target_lang: str):
+        text = self._speculative_call(target_lang, self._translate_fn, story, source_lang, target_lang)
+        if text is None or text == TRANSLATION_FAILED:
+            # Traduction échouée : pas d’audio, la page retentera au premier plan
+            return None
+        audio = self._speculative_call(target_lang, self._tts_fn, text, target_lang)
+        if audio is None:
+            return None
+        return text, audio
+
+    def get(self, lang: str, timeout: float | None = None):
+        """
+        Renvoie (texte_traduit, audio_traduit) pour `lang`, ou None si la langue
+        n’a pas été préparée, si la tâche a été annulée ou si elle a échoué,
+        ou si elle n’est pas terminée après `timeout` secondes (0 : sans attendre).
+        """
+        future = self._futures.get(lang)
+        if future is None or future.cancelled():
+            return None
+        try:
+            return future.result(timeout=timeout)
+        except Exception:
+            # Échec réseau ou gTTS : l’appelant retombera sur une génération classique
+            return None
+
+    def cancel(self, lang: str | None = None) -> None:
+        """
+        Sans argument : annule toutes les tâches en attente.
+        Avec `lang` : abandonne seulement cette langue.
+        Dans les deux cas, une tâche déjà lancée s’arrête avant son prochain appel
+        externe (un appel déjà parti vers Google Translate ou gTTS va à son terme).
+        """
+        if lang is not None:
+            self._cancelled_langs.add(lang)
+            future = self._futures.pop(lang, None)
+            if future is not None:
+                future.cancel()
+            return
+        self._cancelled.set()
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,215 @@
+# back_end/profiling.py
+
+import os
+import io
+import sys
+import json
+import time
+import pstats
+import cProfile
+import threading
+import tracemalloc
+from datetime import datetime
+
+# Profilage à la demande : FEEDODO_PROFILE=1 (toutes les générations) ou ?profile=1 dans l’URL
+PROFILE_ENABLED = os.getenv("FEEDODO_PROFILE") == "1"
+PROFILE_DIR = os.getenv("FEEDODO_PROFILE_DIR", "profiles")
+# Nombre de runs conservés sur disque (les plus anciens sont supprimés)
+PROFILE_KEEP = int(os.getenv("FEEDODO_PROFILE_KEEP", "10"))
+PROFILE_TOP = 25
+TRACEMALLOC_FRAMES = 10
+# Python ≥ 3.12 : cProfile s’appuie sur sys.monitoring et observe tous les threads du
+# processus (autres sessions et traductions spéculatives comprises). Avant 3.12, il
+# n’observe que le thread qui l’a activé, plus les callables passés à profiled_call.
+CPROFILE_PROCESS_WIDE = sys.version_info >= (3, 12)
+
+# cProfile et tracemalloc sont globaux au processus : un seul run profilé à la fois
+_active_lock = threading.Lock()
+_active = None
+
+
+def profiling_requested(query_params) -> bool:
+    return PROFILE_ENABLED or query_params.get("profile") == "1"
+
+
+class RunProfiler:
+    """
+    Capture un profil cProfile (voir CPROFILE_PROCESS_WIDE pour sa portée) et un
+    instantané tracemalloc (tous les threads) pour un run, puis l’enregistre dans
+    PROFILE_DIR.
+    """
+
+    def __init__(self, label: str):
+        self.label = label
+        self._thread = None
+        self._profile = None
+        self._started_tracemalloc = False
+        self._worker_profiles = []
+        self._workers_lock = threading.Lock()
+        self._stopped = False
+
+    def start(self) -> bool:
+        """
+        Démarre la capture. Renvoie False si un autre run est déjà profilé.
+        """
+        global _active
+        with _active_lock:
+            if _active is not None:
+                if _active._thread.is_alive():
+                    return False
+                # Le run précédent s’est interrompu (exception) sans appeler stop()
+                _active._abort()
+            _active = self
+            self._thread = threading.current_thread()
+
+        self._started_tracemalloc = not tracemalloc.is_tracing()
+        if self._started_tracemalloc:
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+        tracemalloc.reset_peak()
+        self._started_at = time.perf_counter()
+        self._profile = cProfile.Profile()
+        self._profile.enable()
+        return True
+
+    def _abort(self) -> None:
+        try:
+            self._profile.disable()
+        except Exception:
+            pass
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+
+    def stop(self) -> str | None:
+        """
+        Arrête la capture, enregistre le run et renvoie son identifiant.
+        """
+        global _active
+        with _active_lock:
+            if _active is not self:
+                return None
+            _active = None
+
+        self._profile.disable()
+        with self._workers_lock:
+            self._stopped = True
+            stats = pstats.Stats(self._profile, stream=io.StringIO())
+            for worker_profile in self._worker_profiles:
+                stats.add(worker_profile)
+        wall_time = time.perf_counter() - self._started_at
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+
+        run_id = f"{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}_{self.label}"
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        stats.dump_stats(os.path.join(PROFILE_DIR, f"{run_id}.pstats"))
+
+        summary = {
+            "run_id": run_id,
+            "label": self.label,
+            "wall_time_s": round(wall_time, 3),
+            "cprofile_scope": "processus" if CPROFILE_PROCESS_WIDE else "run",
+            "memory_current_kib": round(current / 1024, 1),
+            "memory_peak_kib": round(peak / 1024, 1),
+            "top_functions": _top_functions(stats),
+            "top_allocations": _top_allocations(snapshot)
+        }
+        with open(os.path.join(PROFILE_DIR, f"{run_id}.json"), "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+
+        _prune_runs()
+        return run_id
+
+    def _add_worker_profile(self, profile: cProfile.Profile) -> None:
+        with self._workers_lock:
+            if not self._stopped:
+                self._worker_profiles.append(profile)
+
+
+def profiled_call(run: RunProfiler | None, fn, *args, **kwargs):
+    """
+    Exécute `fn(*args, **kwargs)` (typiquement dans un thread d’un executor) pour le
+    compte de `run`, lié au moment de la soumission : le temps passé dans `fn` est ajouté
+    à ce run seulement, jamais à celui d’une autre session.
+    Sans run, ou sous Python ≥ 3.12 (le profil du run observe déjà tous les threads),
+    `fn` est simplement appelée.
+    """
+    if run is None or CPROFILE_PROCESS_WIDE:
+        return fn(*args, **kwargs)
+    profile = cProfile.Profile()
+    profile.enable()
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        profile.disable()
+        run._add_worker_profile(profile)
+
+
+def _top_functions(stats: pstats.Stats) -> list[dict]:
+    rows = []
+    for (filename, lineno, name), (_, ncalls, tottime, cumtime, _) in stats.stats.items():
+        rows.append({
+            "fonction": name,
+            "emplacement": f"{filename}:{lineno}",
+            "appels": ncalls,
+            "tottime_s": round(tottime, 4),
+            "cumtime_s": round(cumtime, 4)
+        })
+    rows.sort(key=lambda row: row["cumtime_s"], reverse=True)
+    return rows[:PROFILE_TOP]
+
+
+def _top_allocations(snapshot: tracemalloc.Snapshot) -> list[dict]:
+    snapshot = snapshot.filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>")
+    ])
+    return [
+        {
+            "emplacement": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+            "taille_kib": round(stat.size / 1024, 1),
+            "blocs": stat.count
+        }
+        for stat in snapshot.statistics("lineno")[:PROFILE_TOP]
+    ]
+
+
+def _run_ids() -> list[str]:
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    return sorted(
+        (name[:-len(".json")] for name in os.listdir(PROFILE_DIR) if name.endswith(".json")),
+        reverse=True
+    )
+
+
+def _prune_runs() -> None:
+    for run_id in _run_ids()[PROFILE_KEEP:]:
+        for ext in (".json", ".pstats"):
+            try:
+                os.remove(os.path.join(PROFILE_DIR, run_id + ext))
+            except FileNotFoundError:
+                pass
+
+
+def list_runs() -> list[dict]:
+    """
+    Renvoie les résumés des runs enregistrés, du plus récent au plus ancien.
+    """
+    runs = []
+    for run_id in _run_ids():
+        try:
+            with open(os.path.join(PROFILE_DIR, f"{run_id}.json"), encoding="utf-8") as f:
+                runs.append(json.load(f))
+        except (FileNotFoundError, json.JSONDecodeError):
+            continue
+    return runs
+
+
+def load_pstats(run_id: str) -> bytes | None:
+    try:
+        with open(os.path.join(PROFILE_DIR, f"{os.path.basename(run_id)}.pstats"), "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
@@ -0,0 +1,267 @@
+# back_end/storage.py
+
+import os
+import json
+import time
+import hashlib
+import tempfile
+import threading
+from io import BytesIO
+from PIL import Image
+
+# Durée de vie par défaut des artefacts (histoires, images, audios, EPUB) : 7 jours
+DEFAULT_TTL = int(os.getenv("FEEDODO_ARTIFACT_TTL", str(7 * 24 * 3600)))
+# Intervalle entre deux nettoyages du stockage local (secondes)
+PRUNE_INTERVAL = int(os.getenv("FEEDODO_STORAGE_PRUNE_INTERVAL", "3600"))
+# Âge au-delà duquel un fichier temporaire est considéré comme abandonné (écriture interrompue)
+STALE_TMP_AGE = 3600
+
+
+def content_key(kind: str, *parts) -> str:
+    """
+    Construit une clé adressée par contenu : `<kind>:<sha256 des parties>`.
+    Chaque partie (str ou bytes) est préfixée par sa longueur pour éviter les collisions.
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode("utf-8")
+        digest.update(len(part).to_bytes(8, "big"))
+        digest.update(part)
+    return f"{kind}:{digest.hexdigest()}"
+
+
+class ArtifactStore:
+    """
+    Interface commune des backends de stockage : des octets rangés sous une clé,
+    avec une durée de vie (en secondes, None = DEFAULT_TTL, 0 = illimitée).
+    """
+
+    def get_many(self, keys: list[str]) -> dict[str, bytes]:
+        """
+        Renvoie {clé: octets} pour les clés présentes et non expirées.
+        """
+        raise NotImplementedError
+
+    def put_many(self, items: dict[str, bytes], ttl: int | None = None) -> None:
+        raise NotImplementedError
+
+    def get(self, key: str) -> bytes | None:
+        return self.get_many([key]).get(key)
+
+    def put(self, key: str, data: bytes, ttl: int | None = None) -> None:
+        self.put_many({key: data}, ttl)
+
+
+class LocalFileStore(ArtifactStore):
+    """
+    Stockage sur disque : un fichier par clé, précédé de sa date d’expiration.
+    Partageable entre réplicas via un volume monté (NFS, EFS...).
+    """
+
+    def __init__(self, root: str = "artifacts"):
+        self.root = root
+        self._last_prune = 0.0
+        self._prune_lock = threading.Lock()
+
+    def _path(self, key: str) -> str:
+        kind, _, digest = key.partition(":")
+        # Une clé ne doit jamais sortir de `root` ni viser un fichier caché (temporaires)
+        for part in (kind, digest):
+            if not part or part.startswith(".") or "/" in part or "\\" in part:
+                raise ValueError(f"Clé de stockage invalide : {key!r}")
+        return os.path.join(self.root, kind, digest)
+
+    def get_many(self, keys: list[str]) -> dict[str, bytes]:
+        found = {}
+        now = time.time()
+        for key in keys:
+            path = self._path(key)
+            try:
+                with open(path, "rb") as f:
+                    expires_at = int.from_bytes(f.read(8), "big")
+                    data = f.read()
+            except FileNotFoundError:
+                continue
+            if expires_at and expires_at < now:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                continue
+            found[key] = data
+        return found
+
+    def put_many(self, items: dict[str, bytes], ttl: int | None = None) -> None:
+        ttl = DEFAULT_TTL if ttl is None else ttl
+        expires_at = int(time.time()) + ttl if ttl else 0
+        for key, data in items.items():
+            path = self._path(key)
+            directory = os.path.dirname(path)
+            os.makedirs(directory, exist_ok=True)
+            # Écriture atomique via un fichier temporaire unique (par thread et par réplica) :
+            # un lecteur ne voit jamais un fichier à moitié écrit
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(expires_at.to_bytes(8, "big"))
+                    f.write(data)
+                os.replace(tmp_path, path)
+            except BaseException:
+                try:
+                    os.remove(tmp_path)
+                except FileNotFoundError:
+                    pass
+                raise
+
+        if time.time() - self._last_prune >= PRUNE_INTERVAL:
+            self.prune()
+
+    def prune(self) -> int:
+        """
+        Supprime les artefacts expirés et les fichiers temporaires abandonnés.
+        Un seul nettoyage à la fois par processus ; renvoie le nombre de fichiers supprimés.
+        """
+        if not self._prune_lock.acquire(blocking=False):
+            return 0
+        try:
+            now = time.time()
+            self._last_prune = now
+            removed = 0
+            for directory, _, filenames in os.walk(self.root):
+                for name in filenames:
+                    path = os.path.join(directory, name)
+                    try:
+                        if name.startswith(".tmp-"):
+                            expired = os.path.getmtime(path) < now - STALE_TMP_AGE
+                        else:
+                            with open(path, "rb") as f:
+                                expires_at = int.from_bytes(f.read(8), "big")
+                            expired = bool(expires_at) and expires_at < now
+                        if expired:
+                            os.remove(path)
+                            removed += 1
+                    except FileNotFoundError:
+                        # Supprimé ou remplacé entre-temps par un autre thread ou réplica
+                        continue
+            return removed
+        finally:
+            self._prune_lock.release()
+
+
+class RedisStore(ArtifactStore):
+    """
+    Stockage clé-valeur en réseau (Redis ou compatible : KeyDB, Valkey...).
+    """
+
+    def __init__(self, url: str = "redis://localhost:6379/0", prefix: str = "feedodo:", client=None):
+        """
+        `client` permet de fournir un client déjà construit (pool partagé, fakeredis...).
+        """
+        if client is None:
+            try:
+                import redis
+            except ImportError as e:
+                raise RuntimeError("Le backend Redis nécessite le paquet `redis` (pip install redis).") from e
+            client = redis.Redis.from_url(url)
+        self._client = client
+        self.prefix = prefix
+
+    def get_many(self, keys: list[str]) -> dict[str, bytes]:
+        if not keys:
+            return {}
+        values = self._client.mget([self.prefix + key for key in keys])
+        return {key: value for key, value in zip(keys, values) if value is not None}
+
+    def put_many(self, items: dict[str, bytes], ttl: int | None = None) -> None:
+        if not items:
+            return
+        ttl = DEFAULT_TTL if ttl is None else ttl
+        pipe = self._client.pipeline(transaction=False)
+        for key, data in items.items():
+            pipe.set(self.prefix + key, data, ex=ttl or None)
+        pipe.execute()
+
+
+def get_store() -> ArtifactStore:
+    """
+    Choisit le backend selon FEEDODO_STORAGE (`local` par défaut, ou `redis`).
+    """
+    backend = os.getenv("FEEDODO_STORAGE", "local")
+    if backend == "redis":
+        return RedisStore(os.getenv("FEEDODO_REDIS_URL", "redis://localhost:6379/0"))
+    if backend == "local":
+        return LocalFileStore(os.getenv("FEEDODO_STORAGE_DIR", "artifacts"))
+    raise RuntimeError(f"Backend de stockage inconnu : {backend}")
+
+
+def cached_call(store: ArtifactStore, key: str, producer, encode, decode, ttl: int | None = None):
+    """
+    Renvoie decode(octets) si `key` est déjà stockée, sinon appelle `producer()`,
+    enregistre encode(résultat) et renvoie le résultat.
+    """
+    data = store.get(key)
+    if data is not None:
+        return decode(data)
+    result = producer()
+    store.put(key, encode(result), ttl)
+    return result
+
+
+def save_story_manifest(store: ArtifactStore, manifest: dict) -> str:
+    """
+    Enregistre le manifeste d’une histoire (textes + clés de ses artefacts) et renvoie sa clé.
+    Champs attendus : story, story_lang, images ([partie, clé_image]), audio_original,
+    story_translated, translated_lang, audio_translated.
+    """
+    data = json.dumps(manifest, ensure_ascii=False, sort_keys=True).encode("utf-8")
+    key = content_key("story", data)
+    store.put(key, data)
+    return key
+
+
+def load_story_manifest(store: ArtifactStore, key: str) -> dict | None:
+    """
+    Recharge un manifeste et ses artefacts en une lecture groupée.
+    Renvoie les champs de session (images décodées, audios en BytesIO), ou None si expiré
+    ou invalide.
+    Les images manquantes sont ignorées, les audios manquants valent None.
+    """
+    try:
+        data = store.get(key)
+        if data is None:
+            return None
+        manifest = json.loads(data)
+        artifact_keys = [image_key for _, image_key in manifest["images"]] + [manifest["audio_original"]]
+        if manifest["audio_translated"]:
+            artifact_keys.append(manifest["audio_translated"])
+        blobs = store.get_many(artifact_keys)
+
+        audio_original = blobs.get(manifest["audio_original"])
+        audio_translated = blobs.get(manifest["audio_translated"])
+        return {
+            "story": manifest["story"],
+            "story_lang": manifest["story_lang"],
+            "story_translated": manifest["story_translated"],
+            "translated_lang": manifest["translated_lang"],
+            "images": [
+                (part, bytes_to_image(blobs[image_key]))
+                for part, image_key in manifest["images"]
+                if image_key in blobs
+            ],
+            "audio_original": BytesIO(audio_original) if audio_original else None,
+            "audio_translated": BytesIO(audio_translated) if audio_translated else None
+        }
+    except (ValueError, KeyError, TypeError):
+        # Clé invalide, JSON illisible ou manifeste incomplet : traité comme expiré
+        return None
+
+
+def image_to_bytes(image: Image.Image) -> bytes:
+    buffer = BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def bytes_to_image(data: bytes) -> Image.Image:
+    return Image.open(BytesIO(data))
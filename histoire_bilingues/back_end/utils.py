@@ -1 +1,19 @@
-# Fonctions utilitaires communes (cleaning, etc.)
\ No newline at end of file
+# Fonctions utilitaires communes (cleaning, etc.)
+
+import os
+import threading
+
+# Budget partagé d’appels simultanés vers les services externes
+# (Groq, Google Translate, gTTS, ClipDrop). Le module n’est importé qu’une
+# fois par processus Streamlit : toutes les sessions partagent donc ce budget.
+UPSTREAM_BUDGET = threading.BoundedSemaphore(int(os.getenv("FEEDODO_UPSTREAM_BUDGET", "4")))
+
+# Texte renvoyé par translate_text quand Google Translate répond en erreur
+TRANSLATION_FAILED = "[Échec de la traduction]"
+
+def call_with_budget(fn, *args, **kwargs):
+    """
+    Exécute `fn(*args, **kwargs)` en occupant une place du budget partagé.
+    """
+    with UPSTREAM_BUDGET:
+        return fn(*args, **kwargs)
@@ -0,0 +1,133 @@
+# benchmarks/bench_image_batching.py
+"""
+Compare l’illustration scène par scène et le mode groupé (grille découpée) :
+nombre d’appels ClipDrop, crédits consommés et temps total par histoire.
+
+Depuis le dossier histoire_bilingues :
+    python -m benchmarks.bench_image_batching                 # ClipDrop simulé
+    python -m benchmarks.bench_image_batching --live          # vrai ClipDrop (consomme des crédits !)
+    python -m benchmarks.bench_image_batching --scenes 2 4 6 --latency 4
+    python -m benchmarks.bench_image_batching --reject-rate 0.3     # panneaux vides simulés
+"""
+
+import argparse
+import random
+import re
+import threading
+import time
+import concurrent.futures
+from PIL import Image
+
+from back_end.image_generator import (
+    generate_image_from_prompt,
+    generate_images_batched,
+    generate_image_prompt,
+    split_story_to_chunks
+)
+from back_end.utils import call_with_budget
+
+# ClipDrop text-to-image : 1 crédit par appel réussi
+CREDITS_PER_CALL = 1
+
+SAMPLE_STORY = (
+    "Il était une fois une petite licorne nommée Lila qui vivait au bord d’un lac enchanté. "
+    "Chaque matin, elle saluait les canards et les grenouilles qui chantaient au soleil. "
+    "Un jour, un nuage gris cacha le soleil et la forêt devint toute silencieuse. "
+    "Lila partit alors chercher le vent du nord pour lui demander de l’aide. "
+    "Le vent souffla très fort et le nuage s’envola au-delà des montagnes. "
+    "Le soleil revint, les animaux dansèrent et Lila s’endormit, heureuse, sous les étoiles."
+)
+
+
+class CountingImageFn:
+    """
+    Enveloppe une fonction de génération d’image et compte les appels.
+    """
+
+    def __init__(self, image_fn):
+        self._image_fn = image_fn
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def __call__(self, prompt: str) -> Image.Image:
+        with self._lock:
+            self.calls += 1
+        return self._image_fn(prompt)
+
+
+def simulated_clipdrop(latency: float, reject_rate: float = 0.0, seed: int = 0):
+    """
+    Imite ClipDrop : attend `latency` secondes et renvoie une image 1024x1024 texturée.
+    Pour un prompt en grille, chaque panneau est laissé vide avec la probabilité
+    `reject_rate`, ce qui déclenche le contrôle qualité et le repli scène par scène.
+    """
+    rng = random.Random(seed)
+    rng_lock = threading.Lock()
+
+    def image_fn(prompt: str) -> Image.Image:
+        time.sleep(latency)
+        image = Image.effect_noise((1024, 1024), 64).convert("RGB")
+        match = re.search(r"(\d+)x(\d+) grid of (\d+)", prompt)
+        if match and reject_rate:
+            rows, cols, n = (int(value) for value in match.groups())
+            tile_w, tile_h = 1024 // cols, 1024 // rows
+            for idx in range(n):
+                with rng_lock:
+                    rejected = rng.random() < reject_rate
+                if rejected:
+                    row, col = divmod(idx, cols)
+                    image.paste("white", (col * tile_w, row * tile_h, (col + 1) * tile_w, (row + 1) * tile_h))
+        return image
+    return image_fn
+
+
+def run_per_scene(parts: list[str], image_fn) -> list[Image.Image]:
+    # Même parallélisme que app.py : une tâche par scène, chacune sous le budget partagé
+    with concurrent.futures.ThreadPoolExecutor() as executor:
+        return list(executor.map(
+            lambda part: call_with_budget(image_fn, generate_image_prompt(part)), parts
+        ))
+
+
+def run_batched(parts: list[str], image_fn) -> list[Image.Image]:
+    images, errors = generate_images_batched(parts, image_fn=image_fn)
+    if errors:
+        raise errors[0]
+    return images
+
+
+def measure(mode, parts: list[str], image_fn) -> tuple[int, float]:
+    counter = CountingImageFn(image_fn)
+    start = time.perf_counter()
+    images = mode(parts, counter)
+    elapsed = time.perf_counter() - start
+    assert len(images) == len(parts)
+    return counter.calls, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenes", type=int, nargs="+", default=[2, 4, 6])
+    parser.add_argument("--latency", type=float, default=1.0, help="latence simulée d’un appel ClipDrop (s)")
+    parser.add_argument("--reject-rate", type=float, default=0.0,
+                        help="proportion de panneaux vides dans les grilles simulées")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--live", action="store_true", help="appeler la vraie API ClipDrop")
+    args = parser.parse_args()
+
+    if args.live:
+        image_fn = generate_image_from_prompt
+    else:
+        image_fn = simulated_clipdrop(args.latency, args.reject_rate, args.seed)
+
+    print(f"{'scènes':>6} | {'mode':<10} | {'appels':>6} | {'crédits':>7} | {'temps (s)':>9}")
+    print("-" * 52)
+    for n in args.scenes:
+        parts = split_story_to_chunks(SAMPLE_STORY, n=n)
+        for name, mode in [("par scène", run_per_scene), ("groupé", run_batched)]:
+            calls, elapsed = measure(mode, parts, image_fn)
+            print(f"{len(parts):>6} | {name:<10} | {calls:>6} | {calls * CREDITS_PER_CALL:>7} | {elapsed:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,7 @@
+# tests/conftest.py
+
+import os
+import sys
+
+# Les tests importent `back_end.*` comme app.py : depuis le dossier histoire_bilingues
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,174 @@
+# tests/test_image_generator.py
+
+import re
+import threading
+
+import pytest
+from PIL import Image
+
+from back_end.image_generator import (
+    CLIPDROP_IMAGE_SIZE,
+    TILE_MIN_SIZE,
+    generate_grid_prompt,
+    generate_image_prompt,
+    generate_images_batched,
+    grid_shape,
+    max_scenes_per_grid,
+    slice_grid,
+    split_into_grids,
+    tile_is_valid,
+    tile_size
+)
+
+
+def noise_image(size=(CLIPDROP_IMAGE_SIZE, CLIPDROP_IMAGE_SIZE)) -> Image.Image:
+    return Image.effect_noise(size, 64).convert("RGB")
+
+
+class FakeClipDrop:
+    """
+    Faux `image_fn` : grilles et scènes texturées, avec panneaux vides ou erreurs à la demande.
+    """
+
+    def __init__(self, blank_panels=(), grid_error=None, failing_scenes=()):
+        self.blank_panels = set(blank_panels)
+        self.grid_error = grid_error
+        self.failing_scenes = set(failing_scenes)
+        self.grid_calls = 0
+        self.scene_prompts = []
+        self._lock = threading.Lock()
+
+    def __call__(self, prompt: str) -> Image.Image:
+        match = re.search(r"(\d+)x(\d+) grid of (\d+)", prompt)
+        if match is None:
+            with self._lock:
+                self.scene_prompts.append(prompt)
+            if any(scene in prompt for scene in self.failing_scenes):
+                raise RuntimeError("❌ Erreur ClipDrop : 500 - boom")
+            return noise_image()
+
+        with self._lock:
+            self.grid_calls += 1
+        if self.grid_error:
+            raise RuntimeError(self.grid_error)
+        rows, cols, _ = (int(value) for value in match.groups())
+        image = noise_image()
+        tile_w, tile_h = CLIPDROP_IMAGE_SIZE // cols, CLIPDROP_IMAGE_SIZE // rows
+        for idx in self.blank_panels:
+            row, col = divmod(idx, cols)
+            image.paste("white", (col * tile_w, row * tile_h, (col + 1) * tile_w, (row + 1) * tile_h))
+        return image
+
+
+# ─── Grille ───
+
+@pytest.mark.parametrize("n, expected", [(1, (1, 1)), (2, (1, 2)), (3, (2, 2)), (4, (2, 2)), (5, (2, 3)), (9, (3, 3)), (10, (3, 4))])
+def test_grid_shape(n, expected):
+    rows, cols = grid_shape(n)
+    assert (rows, cols) == expected
+    assert rows * cols >= n
+
+
+def test_grid_prompt_fits_clipdrop_limit():
+    prompt, rows, cols = generate_grid_prompt(["scène " * 100] * 6)
+    assert (rows, cols) == (2, 3)
+    assert len(prompt) <= 1000
+    assert "Panel 6:" in prompt
+
+
+def test_slice_grid_returns_n_tiles_in_row_order():
+    image = Image.new("RGB", (600, 400))
+    # Chaque cellule d’une grille 2x3 a sa propre couleur
+    for idx in range(6):
+        row, col = divmod(idx, 3)
+        image.paste((idx * 40, 0, 0), (col * 200, row * 200, (col + 1) * 200, (row + 1) * 200))
+
+    tiles = slice_grid(image, 2, 3, 5)
+    assert len(tiles) == 5
+    for idx, tile in enumerate(tiles):
+        assert tile.size == (200 - 2 * 4, 200 - 2 * 4)
+        assert tile.getpixel((tile.width // 2, tile.height // 2)) == (idx * 40, 0, 0)
+
+
+def test_tile_is_valid():
+    assert tile_is_valid(noise_image((300, 300)))
+    assert not tile_is_valid(Image.new("RGB", (300, 300), "white"))
+    assert not tile_is_valid(noise_image((TILE_MIN_SIZE - 1, 300)))
+
+
+def test_grids_never_produce_undersized_tiles():
+    per_grid = max_scenes_per_grid()
+    assert min(tile_size(*grid_shape(per_grid))) >= TILE_MIN_SIZE
+    assert min(tile_size(*grid_shape(per_grid + 1))) < TILE_MIN_SIZE
+
+    for n in range(1, 25):
+        groups = split_into_grids([f"scène {i}" for i in range(n)])
+        assert sum(groups, []) == [f"scène {i}" for i in range(n)]
+        assert all(min(tile_size(*grid_shape(len(group)))) >= TILE_MIN_SIZE for group in groups)
+
+
+# ─── Mode groupé ───
+
+def test_batched_uses_a_single_grid_call():
+    parts = ["Lila la licorne", "Le nuage gris", "Le vent du nord"]
+    clipdrop = FakeClipDrop()
+    images, errors = generate_images_batched(parts, image_fn=clipdrop)
+    assert errors == []
+    assert clipdrop.grid_calls == 1
+    assert clipdrop.scene_prompts == []
+    assert all(image is not None and tile_is_valid(image) for image in images)
+
+
+def test_batched_regenerates_invalid_tiles():
+    parts = ["Lila la licorne", "Le nuage gris", "Le vent du nord"]
+    clipdrop = FakeClipDrop(blank_panels={1})
+    images, errors = generate_images_batched(parts, image_fn=clipdrop)
+    assert errors == []
+    assert clipdrop.grid_calls == 1
+    assert clipdrop.scene_prompts == [generate_image_prompt("Le nuage gris")]
+    assert all(image is not None for image in images)
+
+
+def test_batched_reraises_exhausted_credits():
+    clipdrop = FakeClipDrop(grid_error="❌ Erreur ClipDrop : 402 - no credits")
+    with pytest.raises(RuntimeError, match="402"):
+        generate_images_batched(["a", "b"], image_fn=clipdrop)
+    assert clipdrop.scene_prompts == []
+
+
+def test_batched_falls_back_to_per_scene_calls_on_grid_error():
+    parts = ["Lila la licorne", "Le nuage gris"]
+    clipdrop = FakeClipDrop(grid_error="❌ Erreur ClipDrop : 500 - boom")
+    images, errors = generate_images_batched(parts, image_fn=clipdrop)
+    assert errors == []
+    assert sorted(clipdrop.scene_prompts) == sorted(generate_image_prompt(part) for part in parts)
+    assert all(image is not None for image in images)
+
+
+def test_batched_keeps_valid_tiles_when_a_fallback_fails():
+    parts = ["Lila la licorne", "Le nuage gris", "Le vent du nord"]
+    clipdrop = FakeClipDrop(blank_panels={0, 2}, failing_scenes={"Le vent du nord"})
+    images, errors = generate_images_batched(parts, image_fn=clipdrop)
+    assert len(errors) == 1
+    assert images[0] is not None
+    assert images[1] is not None
+    assert images[2] is None
+
+
+def test_batched_splits_large_stories_into_valid_grids():
+    parts = [f"scène {i}" for i in range(10)]
+    clipdrop = FakeClipDrop()
+    images, errors = generate_images_batched(parts, image_fn=clipdrop)
+    assert errors == []
+    assert clipdrop.grid_calls == 2
+    assert clipdrop.scene_prompts == []
+    assert all(image is not None for image in images)
+
+
+def test_batched_single_scene_skips_the_grid():
+    clipdrop = FakeClipDrop()
+    images, errors = generate_images_batched(["Lila la licorne"], image_fn=clipdrop)
+    assert errors == []
+    assert clipdrop.grid_calls == 0
+    assert clipdrop.scene_prompts == [generate_image_prompt("Lila la licorne")]
+    assert images[0] is not None
@@ -0,0 +1,137 @@
+# tests/test_prefetch.py
+
+import threading
+from io import BytesIO
+
+from back_end.prefetch import TranslationPrefetcher
+from back_end.utils import TRANSLATION_FAILED
+
+
+def fake_translate(text: str, source_lang: str, target_lang: str) -> str:
+    return f"{text} [{source_lang}->{target_lang}]"
+
+
+def fake_tts(text: str, lang: str) -> BytesIO:
+    return BytesIO(f"mp3:{lang}:{text}".encode("utf-8"))
+
+
+def test_prefetch_translates_other_languages_and_skips_source():
+    prefetcher = TranslationPrefetcher(fake_translate, fake_tts)
+    prefetcher.start("Il était une fois", "fr", ["fr", "en", "es"])
+
+    assert prefetcher.get("fr") is None
+
+    text, audio = prefetcher.get("en", timeout=5)
+    assert text == "Il était une fois [fr->en]"
+    assert audio.getvalue() == "mp3:en:Il était une fois [fr->en]".encode("utf-8")
+    assert prefetcher.get("es", timeout=5)[0] == "Il était une fois [fr->es]"
+    prefetcher.cancel()
+
+
+def test_prefetch_get_without_waiting_returns_none_until_ready():
+    release = threading.Event()
+
+    def slow_translate(text, source_lang, target_lang):
+        release.wait(5)
+        return fake_translate(text, source_lang, target_lang)
+
+    prefetcher = TranslationPrefetcher(slow_translate, fake_tts)
+    prefetcher.start("Il était une fois", "fr", ["en"])
+    assert prefetcher.get("en", timeout=0) is None
+
+    release.set()
+    assert prefetcher.get("en", timeout=5)[0] == "Il était une fois [fr->en]"
+    prefetcher.cancel()
+
+
+def test_prefetch_failure_returns_none():
+    def failing_tts(text, lang):
+        raise RuntimeError("Erreur lors de la génération audio : boom")
+
+    prefetcher = TranslationPrefetcher(fake_translate, failing_tts)
+    prefetcher.start("Il était une fois", "fr", ["en"])
+    assert prefetcher.get("en", timeout=5) is None
+    prefetcher.cancel()
+
+
+def test_prefetch_translation_failure_skips_tts():
+    tts_calls = []
+
+    def failed_translate(text, source_lang, target_lang):
+        return TRANSLATION_FAILED
+
+    def recording_tts(text, lang):
+        tts_calls.append(lang)
+        return fake_tts(text, lang)
+
+    prefetcher = TranslationPrefetcher(failed_translate, recording_tts)
+    prefetcher.start("Il était une fois", "fr", ["en"])
+    assert prefetcher.get("en", timeout=5) is None
+    assert tts_calls == []
+    prefetcher.cancel()
+
+
+def test_prefetch_cancel_stops_pending_work():
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def blocking_translate(text, source_lang, target_lang):
+        calls.append(target_lang)
+        started.set()
+        release.wait(5)
+        return fake_translate(text, source_lang, target_lang)
+
+    prefetcher = TranslationPrefetcher(blocking_translate, fake_tts)
+    prefetcher.start("Il était une fois", "fr", ["en", "es"])
+    assert started.wait(5)
+
+    prefetcher.cancel()
+    release.set()
+    # La tâche en cours s’arrête avant l’appel TTS, la suivante n’est jamais lancée
+    assert prefetcher.get("en", timeout=5) is None
+    assert prefetcher.get("es", timeout=5) is None
+    assert calls == ["en"]
+
+
+def test_prefetch_cancel_single_language():
+    release = threading.Event()
+
+    def slow_translate(text, source_lang, target_lang):
+        release.wait(5)
+        return fake_translate(text, source_lang, target_lang)
+
+    prefetcher = TranslationPrefetcher(slow_translate, fake_tts)
+    prefetcher.start("Il était une fois", "fr", ["en", "es"])
+    prefetcher.cancel("es")
+    release.set()
+
+    assert prefetcher.get("es", timeout=5) is None
+    assert prefetcher.get("en", timeout=5)[0] == "Il était une fois [fr->en]"
+    prefetcher.cancel()
+
+
+def test_prefetch_cancel_running_language_skips_tts():
+    started = threading.Event()
+    release = threading.Event()
+    tts_calls = []
+
+    def blocking_translate(text, source_lang, target_lang):
+        started.set()
+        release.wait(5)
+        return fake_translate(text, source_lang, target_lang)
+
+    def recording_tts(text, lang):
+        tts_calls.append(lang)
+        return fake_tts(text, lang)
+
+    prefetcher = TranslationPrefetcher(blocking_translate, recording_tts)
+    prefetcher.start("Il était une fois", "fr", ["en", "es"])
+    assert started.wait(5)
+
+    # "en" est déjà en cours de traduction : son appel TTS est abandonné, "es" continue
+    prefetcher.cancel("en")
+    release.set()
+    assert prefetcher.get("es", timeout=5)[0] == "Il était une fois [fr->es]"
+    assert tts_calls == ["es"]
+    prefetcher.cancel()
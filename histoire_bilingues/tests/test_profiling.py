@@ -0,0 +1,133 @@
+# tests/test_profiling.py
+
+import concurrent.futures
+import os
+import tracemalloc
+
+import pytest
+
+from back_end import profiling
+from back_end.profiling import RunProfiler, list_runs, load_pstats, profiled_call
+
+
+@pytest.fixture(autouse=True)
+def profile_dir(tmp_path, monkeypatch):
+    directory = tmp_path / "profiles"
+    monkeypatch.setattr(profiling, "PROFILE_DIR", str(directory))
+    return directory
+
+
+def busy_worker() -> int:
+    return sum(i * i for i in range(50_000))
+
+
+def run_profiled(label: str = "generation") -> str:
+    profiler = RunProfiler(label)
+    assert profiler.start()
+    try:
+        busy_worker()
+    finally:
+        run_id = profiler.stop()
+    return run_id
+
+
+def test_run_is_saved_with_summary_and_pstats(profile_dir):
+    run_id = run_profiled()
+    assert sorted(os.listdir(profile_dir)) == [f"{run_id}.json", f"{run_id}.pstats"]
+
+    (run,) = list_runs()
+    assert run["run_id"] == run_id
+    assert run["label"] == "generation"
+    assert any(row["fonction"] == "busy_worker" for row in run["top_functions"])
+    assert run["top_allocations"]
+    assert not tracemalloc.is_tracing()
+
+
+def test_ring_keeps_only_the_latest_runs(profile_dir, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_KEEP", 2)
+    run_ids = [run_profiled(f"run{i}") for i in range(4)]
+
+    assert [run["run_id"] for run in list_runs()] == run_ids[:1:-1]
+    assert len(os.listdir(profile_dir)) == 4
+
+
+def test_load_pstats_stays_in_profile_dir(profile_dir, tmp_path):
+    run_id = run_profiled()
+    assert load_pstats(run_id)
+    assert load_pstats("absent") is None
+
+    # Un identifiant ne peut pas sortir du dossier des profils
+    (tmp_path / "secret.pstats").write_bytes(b"secret")
+    assert load_pstats("../secret") is None
+    assert load_pstats(f"../profiles/{run_id}") == load_pstats(run_id)
+
+
+def test_only_one_run_profiled_at_a_time():
+    first = RunProfiler("first")
+    assert first.start()
+    try:
+        assert not RunProfiler("second").start()
+    finally:
+        first.stop()
+    assert RunProfiler("second").stop() is None
+
+
+def test_stop_in_finally_after_failure_releases_the_process():
+    profiler = RunProfiler("generation")
+    with pytest.raises(RuntimeError):
+        try:
+            assert profiler.start()
+            raise RuntimeError("Erreur Groq")
+        finally:
+            profiler.stop()
+
+    assert not tracemalloc.is_tracing()
+    assert list_runs()[0]["label"] == "generation"
+    assert run_profiled("next")
+
+
+def test_run_records_cprofile_scope():
+    run_id = run_profiled()
+    (run,) = [run for run in list_runs() if run["run_id"] == run_id]
+    assert run["cprofile_scope"] == ("processus" if profiling.CPROFILE_PROCESS_WIDE else "run")
+
+
+def test_profiled_call_without_run():
+    assert profiled_call(None, sum, [1, 2, 3]) == 6
+
+
+def test_profiled_call_after_stop_is_not_recorded():
+    profiler = RunProfiler("generation")
+    assert profiler.start()
+    profiler.stop()
+    assert profiled_call(profiler, sum, [1, 2, 3]) == 6
+    assert profiler._worker_profiles == []
+
+
+def test_profiled_call_includes_worker_threads():
+    profiler = RunProfiler("generation")
+    assert profiler.start()
+    try:
+        with concurrent.futures.ThreadPoolExecutor() as executor:
+            assert executor.submit(profiled_call, profiler, busy_worker).result() > 0
+    finally:
+        run_id = profiler.stop()
+
+    (run,) = [run for run in list_runs() if run["run_id"] == run_id]
+    assert any(row["fonction"] == "busy_worker" for row in run["top_functions"])
+
+
+@pytest.mark.skipif(profiling.CPROFILE_PROCESS_WIDE, reason="cProfile observe tout le processus")
+def test_profiled_call_only_feeds_the_bound_run():
+    other = RunProfiler("autre-session")
+    profiler = RunProfiler("generation")
+    assert profiler.start()
+    try:
+        # Un travailleur soumis pour une autre session n’entre pas dans ce run
+        with concurrent.futures.ThreadPoolExecutor() as executor:
+            assert executor.submit(profiled_call, other, busy_worker).result() > 0
+    finally:
+        run_id = profiler.stop()
+
+    (run,) = [run for run in list_runs() if run["run_id"] == run_id]
+    assert not any(row["fonction"] == "busy_worker" for row in run["top_functions"])
@@ -0,0 +1,279 @@
+# tests/test_storage.py
+
+import os
+import threading
+from io import BytesIO
+
+import fakeredis
+import pytest
+from PIL import Image
+
+from back_end import storage
+from back_end.storage import (
+    LocalFileStore,
+    RedisStore,
+    content_key,
+    cached_call,
+    image_to_bytes,
+    save_story_manifest,
+    load_story_manifest
+)
+
+
+@pytest.fixture
+def local_store(tmp_path):
+    return LocalFileStore(str(tmp_path / "artifacts"))
+
+
+@pytest.fixture
+def redis_store():
+    return RedisStore(prefix="test:", client=fakeredis.FakeRedis())
+
+
+# ─── content_key ───
+
+def test_content_key_is_stable_and_typed():
+    key = content_key("audio", "Il était une fois", "fr")
+    assert key == content_key("audio", "Il était une fois", "fr")
+    assert key.startswith("audio:")
+    assert len(key.partition(":")[2]) == 64
+    # str et bytes de même contenu donnent la même clé
+    assert key == content_key("audio", "Il était une fois".encode("utf-8"), b"fr")
+
+
+def test_content_key_separates_parts():
+    assert content_key("t", "ab", "c") != content_key("t", "a", "bc")
+    assert content_key("t", "abc") != content_key("t", "ab", "c")
+    assert content_key("audio", "x") != content_key("image", "x")
+
+
+# ─── LocalFileStore ───
+
+def test_local_store_round_trip_and_missing_keys(local_store):
+    local_store.put_many({"audio:a": b"mp3", "image:b": b"png"})
+    local_store.put("epub:c", b"epub")
+
+    assert local_store.get("audio:a") == b"mp3"
+    assert local_store.get_many(["audio:a", "image:b", "epub:c", "audio:absent"]) == {
+        "audio:a": b"mp3",
+        "image:b": b"png",
+        "epub:c": b"epub"
+    }
+    assert local_store.get("audio:absent") is None
+
+
+def test_local_store_ttl_expiry(local_store, monkeypatch):
+    now = 1_000_000.0
+    monkeypatch.setattr(storage.time, "time", lambda: now)
+    local_store.put("audio:court", b"1", ttl=10)
+    local_store.put("audio:illimite", b"2", ttl=0)
+    local_store.put("audio:defaut", b"3")
+
+    now += 11
+    assert local_store.get("audio:court") is None
+    assert local_store.get("audio:illimite") == b"2"
+    assert local_store.get("audio:defaut") == b"3"
+
+    now += storage.DEFAULT_TTL
+    assert local_store.get("audio:defaut") is None
+    assert local_store.get("audio:illimite") == b"2"
+
+
+def test_local_store_concurrent_puts_same_key(local_store):
+    errors = []
+
+    def writer(value):
+        try:
+            for _ in range(50):
+                local_store.put("image:partagee", value)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=writer, args=(bytes([i]) * 1000,)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    data = local_store.get("image:partagee")
+    assert len(data) == 1000 and len(set(data)) == 1
+    # Aucun fichier temporaire ne traîne
+    assert os.listdir(os.path.dirname(local_store._path("image:partagee"))) == ["partagee"]
+
+
+# ─── RedisStore ───
+
+def test_redis_store_batched_get_put(redis_store):
+    redis_store.put_many({"audio:a": b"mp3", "image:b": b"png"})
+    assert redis_store.get_many(["audio:a", "image:b", "audio:absent"]) == {
+        "audio:a": b"mp3",
+        "image:b": b"png"
+    }
+    assert redis_store.get("audio:absent") is None
+    assert redis_store.get_many([]) == {}
+
+
+def test_redis_store_ttl(redis_store):
+    redis_store.put("audio:defaut", b"1")
+    redis_store.put("audio:court", b"2", ttl=30)
+    redis_store.put("audio:illimite", b"3", ttl=0)
+
+    client = redis_store._client
+    assert 0 < client.ttl("test:audio:defaut") <= storage.DEFAULT_TTL
+    assert 0 < client.ttl("test:audio:court") <= 30
+    assert client.ttl("test:audio:illimite") == -1
+
+
+# ─── cached_call ───
+
+def test_cached_call_miss_then_hit(local_store):
+    calls = []
+
+    def producer():
+        calls.append(1)
+        return "traduction"
+
+    def encode(text):
+        return text.encode("utf-8")
+
+    def decode(data):
+        return data.decode("utf-8")
+
+    assert cached_call(local_store, "translation:x", producer, encode, decode) == "traduction"
+    assert cached_call(local_store, "translation:x", producer, encode, decode) == "traduction"
+    assert len(calls) == 1
+    assert local_store.get("translation:x") == b"traduction"
+
+
+# ─── Manifestes d’histoire ───
+
+def _store_story(store):
+    image = Image.new("RGB", (8, 8), "purple")
+    image_key = content_key("image", "prompt scène 1")
+    missing_key = content_key("image", "prompt scène 2")
+    audio_key = content_key("audio", "Il était une fois", "fr")
+    translated_audio_key = content_key("audio", "Once upon a time", "en")
+    store.put_many({
+        image_key: image_to_bytes(image),
+        audio_key: b"mp3-fr",
+        translated_audio_key: b"mp3-en"
+    })
+    return save_story_manifest(store, {
+        "story": "Il était une fois",
+        "story_lang": "fr",
+        "images": [["Scène 1", image_key], ["Scène 2", missing_key]],
+        "audio_original": audio_key,
+        "story_translated": "Once upon a time",
+        "translated_lang": "en",
+        "audio_translated": translated_audio_key
+    })
+
+
+@pytest.mark.parametrize("store_fixture", ["local_store", "redis_store"])
+def test_story_manifest_round_trip(store_fixture, request):
+    store = request.getfixturevalue(store_fixture)
+    key = _store_story(store)
+    assert key.startswith("story:")
+
+    state = load_story_manifest(store, key)
+    assert state["story"] == "Il était une fois"
+    assert state["story_lang"] == "fr"
+    assert state["story_translated"] == "Once upon a time"
+    assert state["translated_lang"] == "en"
+    # L’image absente du stockage est ignorée
+    assert [part for part, _ in state["images"]] == ["Scène 1"]
+    assert state["images"][0][1].size == (8, 8)
+    assert isinstance(state["audio_original"], BytesIO)
+    assert state["audio_original"].getvalue() == b"mp3-fr"
+    assert state["audio_translated"].getvalue() == b"mp3-en"
+
+
+def test_story_manifest_without_translation(local_store):
+    key = save_story_manifest(local_store, {
+        "story": "Il était une fois",
+        "story_lang": "fr",
+        "images": [],
+        "audio_original": content_key("audio", "Il était une fois", "fr"),
+        "story_translated": None,
+        "translated_lang": None,
+        "audio_translated": None
+    })
+    state = load_story_manifest(local_store, key)
+    assert state["images"] == []
+    assert state["audio_original"] is None
+    assert state["audio_translated"] is None
+
+
+def test_story_manifest_expired(local_store):
+    assert load_story_manifest(local_store, "story:" + "0" * 64) is None
+
+
+def test_story_manifest_malformed(local_store):
+    local_store.put("story:illisible", b"pas du json")
+    local_store.put("story:incomplet", b'{"story": "Il \\u00e9tait une fois"}')
+    assert load_story_manifest(local_store, "story:illisible") is None
+    assert load_story_manifest(local_store, "story:incomplet") is None
+
+
+# ─── Clés hostiles ───
+
+@pytest.mark.parametrize("key", [
+    "story:../../victim.bin",
+    "story:..",
+    "../story:abc",
+    "story:a/b",
+    "story:a\\b",
+    "story:.tmp-abc",
+    "story:",
+    ":abc"
+])
+def test_local_store_rejects_keys_outside_root(local_store, tmp_path, key):
+    victim = tmp_path / "victim.bin"
+    victim.write_bytes(b"\x00" * 7 + b"\x01" + b"donnees")
+    os.makedirs(os.path.join(local_store.root, "story"), exist_ok=True)
+
+    with pytest.raises(ValueError):
+        local_store.get(key)
+    with pytest.raises(ValueError):
+        local_store.put(key, b"x")
+    assert load_story_manifest(local_store, key) is None
+    assert victim.exists()
+
+
+def test_local_store_prune_removes_expired_and_stale_files(local_store, monkeypatch):
+    now = 1_000_000.0
+    monkeypatch.setattr(storage.time, "time", lambda: now)
+    local_store.put("audio:court", b"1", ttl=10)
+    local_store.put("audio:illimite", b"2", ttl=0)
+    local_store.put("image:longue", b"3", ttl=3600)
+
+    directory = os.path.dirname(local_store._path("audio:court"))
+    stale_tmp = os.path.join(directory, ".tmp-abandonne")
+    fresh_tmp = os.path.join(directory, ".tmp-en-cours")
+    for path in (stale_tmp, fresh_tmp):
+        with open(path, "wb") as f:
+            f.write(b"partiel")
+    os.utime(stale_tmp, (now - storage.STALE_TMP_AGE - 1,) * 2)
+    os.utime(fresh_tmp, (now,) * 2)
+
+    now += 11
+    assert local_store.prune() == 2
+    assert sorted(os.listdir(directory)) == [".tmp-en-cours", "illimite"]
+    assert local_store.get("image:longue") == b"3"
+    assert local_store.get("audio:illimite") == b"2"
+
+
+def test_local_store_put_prunes_periodically(local_store, monkeypatch):
+    now = 1_000_000.0
+    monkeypatch.setattr(storage.time, "time", lambda: now)
+    local_store.put("audio:court", b"1", ttl=10)
+
+    # Avant l’intervalle : l’artefact expiré reste sur disque tant qu’on ne le relit pas
+    now += 11
+    local_store.put("audio:autre", b"2")
+    assert os.path.exists(local_store._path("audio:court"))
+
+    now += storage.PRUNE_INTERVAL
+    local_store.put("audio:autre", b"2")
+    assert not os.path.exists(local_store._path("audio:court"))